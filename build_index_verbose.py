@@ -0,0 +1,214 @@
+"""
+建立語法點向量索引（詳細輸出版）
+
+讀取 grammar_analysis/grammar_corpus_cleaned.txt，切成語法點 chunk，
+用 Ollama embedding 建立 FAISS 索引並存到 grammar_index/。
+
+執行方式：
+    python build_index_verbose.py
+"""
+
+import os
+import re
+import mmap
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import faiss
+import numpy as np
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from langchain_community.vectorstores import FAISS
+from langchain_ollama import OllamaEmbeddings
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "grammar_analysis", "grammar_corpus_cleaned.txt")
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "grammar_index")
+
+EMBED_MODEL = "nomic-embed-text"
+EMBED_CACHE_PATH = os.path.join(os.path.dirname(__file__), ".embed_cache")
+
+
+def make_embeddings():
+    """Ollama embedding 包上磁碟快取：重建索引時沒變的 chunk 與
+    重複出現的 debug query 都不用再打 Ollama"""
+    return CacheBackedEmbeddings.from_bytes_store(
+        OllamaEmbeddings(model=EMBED_MODEL),
+        LocalFileStore(EMBED_CACHE_PATH),
+        namespace=EMBED_MODEL,
+        query_embedding_cache=True,
+    )
+
+
+# 直接對 mmap bytes 掃：整個檔案只進 regex 引擎一次
+_LEVEL_RE_B = re.compile("(基礎|進階)\\s+第(\\d+)\\*?級".encode("utf-8"))
+
+
+def _clean_chunk(chunk):
+    # ' '.join(chunk.split()) 一次處理 \n+/\t/連續空白，全在 C 層跑
+    return " ".join(chunk.split())
+
+
+def load_and_process_documents(corpus_path=CORPUS_PATH):
+    """讀取語料並切成 Document，metadata 帶 level 資訊。
+
+    f.read() 會把整個檔案複製成 Python str 再 split 出第二份；
+    mmap 讓 OS page cache 當資料本體，空白區段連 UTF-8 decode 都省了。
+    等級標記用一次 finditer 掃完整份檔案，再按位移窗對回各 chunk，
+    不必每個 chunk 各進一次 regex 引擎。
+    """
+    sep = b"---"
+    chunks = []
+    spans = []
+    with open(corpus_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            matches = [
+                (m.start(), m.group(1), m.group(2))
+                for m in _LEVEL_RE_B.finditer(mm)
+            ]
+            start = 0
+            while True:
+                idx = mm.find(sep, start)
+                end = idx if idx != -1 else len(mm)
+                piece = mm[start:end].decode("utf-8", "ignore").strip()
+                if piece:
+                    chunks.append(piece)
+                    spans.append((start, end))
+                if idx == -1:
+                    break
+                start = idx + len(sep)
+
+    metadatas = []
+    mi = 0
+    for s, e in spans:
+        while mi < len(matches) and matches[mi][0] < s:
+            mi += 1
+        if mi < len(matches) and matches[mi][0] < e:
+            metadatas.append(
+                {"category": matches[mi][1].decode("utf-8"), "level": int(matches[mi][2])}
+            )
+        else:
+            metadatas.append({"category": "未知", "level": 0})
+
+    if len(chunks) >= 2000:
+        # 大語料把文字清洗攤到所有核心；小語料不值得付 fork/pickle 成本
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            cleaned = list(pool.map(_clean_chunk, chunks, chunksize=256))
+    else:
+        cleaned = [_clean_chunk(chunk) for chunk in chunks]
+
+    documents = [
+        Document(page_content=text, metadata=meta)
+        for text, meta in zip(cleaned, metadatas)
+    ]
+    print(f"📄 讀到 {len(documents)} 個語法點 chunk")
+    return documents
+
+
+# 約略對應 Ollama 預設 8192 token context（中文一字約一 token）
+MAX_BATCH_CHARS = 6000
+
+
+def _group_texts(texts, max_chars=MAX_BATCH_CHARS):
+    """把 texts 貪婪分組，每組總長度不超過 max_chars（單篇過長自成一組）"""
+    group, group_chars = [], 0
+    for text in texts:
+        if group and group_chars + len(text) > max_chars:
+            yield group
+            group, group_chars = [], 0
+        group.append(text)
+        group_chars += len(text)
+    if group:
+        yield group
+
+
+def _build_store(embeddings, vectors, documents):
+    """用 HNSW + cosine 組 FAISS store。
+
+    LangChain 預設的 IndexFlatL2 在 k 大、帶 metadata filter 時是整表
+    O(N·d) 掃描；HNSW 讓 filter 可以便宜地拉大候選池。短中文字串的
+    語意比對用 cosine（先 normalize 再 inner product）比 L2 合理。
+    """
+    dim = vectors.shape[1]
+    n = vectors.shape[0]
+    faiss.normalize_L2(vectors)
+    if n >= 64 * 40:
+        # 語料夠大才值得 IVF+PQ：記憶體 ~4-8x 縮小，int8 內積也更快。
+        # IVF 訓練經驗法則是每個 centroid 至少 ~40 筆樣本
+        index = faiss.index_factory(dim, "IVF64,PQ48x8", faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.add(vectors)
+    else:
+        # 小語料用 HNSW + int8 scalar 量化：recall 幾乎不掉，記憶體減半
+        index = faiss.index_factory(dim, "HNSW32,SQ8", faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        index.hnsw.efSearch = 64
+        index.train(vectors)
+        index.add(vectors)
+
+    docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(documents)})
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id={i: str(i) for i in range(len(documents))},
+        normalize_L2=True,
+    )
+
+
+def build_verbose():
+    """建立索引，邊建邊印進度"""
+    documents = load_and_process_documents()
+    texts = [d.page_content for d in documents]
+    metadatas = [d.metadata for d in documents]
+    total = len(texts)
+
+    embeddings = make_embeddings()
+
+    # embedding 是 I/O + 模型 bound，用 thread pool 同時送多個 batch 給 Ollama，
+    # 保留 batch 順序最後一次組出 FAISS，避免 add_documents 反覆複製。
+    # batch 不用固定筆數，改成貪婪地塞到接近 Ollama context 上限，
+    # 一次 HTTP 請求送整組，攤平每次請求的固定開銷
+    batches = [(bi, bt) for bi, bt in enumerate(_group_texts(texts))]
+    all_vectors = [None] * len(batches)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+
+        def _embed(bi, batch_texts):
+            # 錯開起跑時間，避免瞬間打爆 Ollama 的佇列
+            time.sleep(random.uniform(0, 0.2))
+            return bi, embeddings.embed_documents(batch_texts)
+
+        futures = [pool.submit(_embed, bi, bt) for bi, bt in batches]
+        done = 0
+        for future in as_completed(futures):
+            bi, vectors = future.result()
+            all_vectors[bi] = vectors
+            done += 1
+            print(f"  ⏳ 進度 {done}/{len(batches)} batch ({time.time() - start:.1f}s)")
+
+    vectors = np.asarray([v for batch in all_vectors for v in batch], dtype="float32")
+    vectorstore = _build_store(embeddings, vectors, documents)
+
+    vectorstore.save_local(INDEX_PATH)
+    print(f"✅ 索引完成，共 {total} 筆，耗時 {time.time() - start:.1f}s，存到 {INDEX_PATH}")
+    return vectorstore
+
+
+def debug_retrieval(vectorstore, queries=None):
+    """用幾個測試 query 檢查檢索結果"""
+    if queries is None:
+        queries = ["把字句", "雖然...但是", "了 的用法"]
+    for query in queries:
+        print(f"\n🔍 查詢：{query}")
+        results = vectorstore.similarity_search(query, k=3)
+        for i, doc in enumerate(results, 1):
+            print(f"  {i}. [{doc.metadata.get('category')}L{doc.metadata.get('level')}] {doc.page_content[:60]}...")
+
+
+if __name__ == "__main__":
+    store = build_verbose()
+    debug_retrieval(store)
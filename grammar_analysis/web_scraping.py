@@ -0,0 +1,106 @@
+"""
+抓取華語語法點列表頁
+
+基礎 / 進階 各 13 頁，抓回每個語法點的標題、等級與說明文字，
+存成 grammar_corpus_raw.txt 給 clean / build index 流程用。
+
+執行方式：
+    python -m grammar_analysis.web_scraping
+"""
+
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
+from bs4 import BeautifulSoup, SoupStrainer
+
+BASE_URL = "https://coct.naer.edu.tw/grammar/list"
+LEVELS = ["基礎", "進階"]
+PAGES_PER_LEVEL = 13
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    )
+}
+
+OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "grammar_corpus_raw.txt")
+
+# keep-alive 共用連線，省掉每頁重新 TCP 握手；
+# 回應快取到 SQLite 並尊重 ETag/Last-Modified，重跑時沒變的頁面只收 304
+session = CachedSession(
+    os.path.join(os.path.dirname(__file__), "scrape_cache"),
+    backend="sqlite",
+    expire_after=86400,
+    cache_control=True,
+    stale_if_error=True,
+)
+session.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+# 對同一站台仍要客氣一點：限制同時在途請求數
+_rate_limiter = threading.Semaphore(4)
+
+# 只解析語法點列表區塊，其他頁面骨架直接略過
+_GRAMMAR_STRAINER = SoupStrainer("div", {"class": ["content", "grammar-list", "grammar-item"]})
+
+
+def fetch_page(level, page):
+    """抓一頁語法點列表，回傳該頁所有語法點的文字區塊"""
+    with _rate_limiter:
+        time.sleep(random.uniform(0.1, 0.25))
+        resp = session.get(BASE_URL, params={"level": level, "page": page}, timeout=15)
+    resp.raise_for_status()
+
+    # 餵 resp.content 省掉 resp.text 的重新 decode；lxml 是 C 實作，
+    # 配合 strainer 只建需要的子樹
+    soup = BeautifulSoup(resp.content, "lxml", parse_only=_GRAMMAR_STRAINER, from_encoding="utf-8")
+    entries = []
+    for item in soup.select("div.grammar-item"):
+        title = item.select_one("h3")
+        desc = item.select_one("div.description")
+        if not title:
+            continue
+        entries.append(
+            f"{level} {title.get_text(strip=True)}\n"
+            f"{desc.get_text(strip=True) if desc else ''}"
+        )
+    return entries
+
+
+def scrape_all():
+    """平行抓完所有頁面，依 (level, page) 順序寫出"""
+    tasks = [(lv, pg) for lv in LEVELS for pg in range(1, PAGES_PER_LEVEL + 1)]
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        future_map = {pool.submit(fetch_page, lv, pg): (lv, pg) for lv, pg in tasks}
+        for future in as_completed(future_map):
+            lv, pg = future_map[future]
+            try:
+                results[(lv, pg)] = future.result()
+                print(f"  ✅ {lv} 第 {pg} 頁：{len(results[(lv, pg)])} 筆")
+            except requests.RequestException as e:
+                print(f"  ⚠️ {lv} 第 {pg} 頁抓取失敗：{e}")
+                results[(lv, pg)] = []
+
+    # 最後一次性依固定順序寫檔，避免多執行緒交錯寫入
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        for lv, pg in tasks:
+            for entry in results[(lv, pg)]:
+                f.write(entry + "\n---\n")
+
+    total = sum(len(v) for v in results.values())
+    print(f"✅ 共抓到 {total} 個語法點，存到 {OUTPUT_PATH}")
+
+
+if __name__ == "__main__":
+    scrape_all()
@@ -0,0 +1,19 @@
+#!/usr/bin/env bash
+# 一鍵安裝並啟動 CNtube
+set -e
+
+cd "$(dirname "$0")"
+
+if [ ! -d ".venv" ]; then
+    echo "🔧 建立虛擬環境 .venv ..."
+    python3 -m venv .venv
+fi
+
+source .venv/bin/activate
+pip install -q -r requirements.txt
+
+echo "🚀 啟動伺服器：http://localhost:5001"
+# 不用 --preload：create_app 會起背景預熱 thread、開 HTTP 連線池，
+# 在 master 裡跑這些再 fork 會讓 worker 繼承死掉的 thread 與共用 socket；
+# 每個 worker 自己 create_app 自己暖
+exec gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:5001 wsgi:app
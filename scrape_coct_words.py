@@ -0,0 +1,83 @@
+"""
+下載 COCT 詞語分級表
+
+從 NDJSON 來源下載詞表，整理成 {等級: [詞, ...]} 存成 coct_words.json，
+給 HybridVocabExtractor 當詞彙分級資料庫用。
+
+執行方式：
+    python scrape_coct_words.py
+"""
+
+import os
+
+import requests
+
+try:
+    import orjson
+
+    def _loads(s):
+        return orjson.loads(s)
+
+    def _dump(obj, path):
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+
+except ImportError:  # orjson 沒裝就退回標準庫
+    import json
+
+    def _loads(s):
+        return json.loads(s)
+
+    def _dump(obj, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
+
+
+JSON_URL = "https://coct.naer.edu.tw/download/tech_report/coct_words.ndjson"
+OUTPUT_PATH = os.path.join(os.path.dirname(__file__), "coct_words.json")
+TRIE_PATH = os.path.join(os.path.dirname(__file__), "coct_words.marisa")
+
+
+def _dump_trie(vocab_db, path=TRIE_PATH):
+    """順手輸出 marisa trie 版詞表：比 Python dict 省一個數量級的記憶體"""
+    try:
+        import marisa_trie
+    except ImportError:
+        return
+    items = [
+        (word, (int(level),))
+        for level, words in vocab_db.items()
+        for word in words
+    ]
+    marisa_trie.RecordTrie("<B", items).save(path)
+    print(f"✅ marisa trie 已存到 {path}")
+
+
+def download_and_process_json():
+    """邊下載邊逐行解析 NDJSON，避免整包 response 留在記憶體"""
+    vocab_db = {}
+    count = 0
+
+    with requests.get(JSON_URL, stream=True, timeout=30) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            item = _loads(line)
+            word = item.get("word", "").strip()
+            level = item.get("level")
+            if not word or level is None:
+                continue
+            vocab_db.setdefault(int(level), []).append(word)
+            count += 1
+            if count % 5000 == 0:
+                print(f"  ⏳ 已處理 {count} 筆")
+
+    _dump(vocab_db, OUTPUT_PATH)
+    _dump_trie(vocab_db)
+    print(f"✅ 共 {count} 個詞、{len(vocab_db)} 個等級，存到 {OUTPUT_PATH}")
+    return vocab_db
+
+
+if __name__ == "__main__":
+    download_and_process_json()
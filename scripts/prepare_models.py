@@ -0,0 +1,46 @@
+"""
+預先轉換 Whisper 模型成 CTranslate2 int8 格式
+
+compute_type="int8" 在每次載入時都要現場重新量化 float 權重；
+先用 ct2-transformers-converter 轉好存檔，啟動直接載 int8 權重，
+省掉每次冷啟動的量化秒數，權重也是確定性的。
+
+執行方式：
+    python scripts/prepare_models.py
+"""
+
+import os
+import subprocess
+import sys
+
+MODEL_ID = "openai/whisper-medium"
+OUTPUT_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "models", "whisper-medium-int8"
+)
+
+
+def main():
+    if os.path.isdir(OUTPUT_DIR):
+        print(f"✅ {OUTPUT_DIR} 已存在，跳過轉換")
+        return
+
+    print(f"⏳ 轉換 {MODEL_ID} -> int8 ...")
+    subprocess.run(
+        [
+            "ct2-transformers-converter",
+            "--model", MODEL_ID,
+            "--output_dir", OUTPUT_DIR,
+            "--quantization", "int8",
+            "--copy_files", "tokenizer.json", "preprocessor_config.json",
+        ],
+        check=True,
+    )
+    print(f"✅ 轉換完成，存到 {OUTPUT_DIR}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except subprocess.CalledProcessError as exc:
+        print(f"⚠️ 轉換失敗：{exc}")
+        sys.exit(1)
@@ -0,0 +1,255 @@
+"""
+CNtube 網頁伺服器
+
+前端入口與 API：
+  POST /process       — 下載 YouTube 音訊並串流轉錄（NDJSON）
+  POST /process_async — 丟背景工作，立即回 job_id
+  GET  /status/<id>   — 查背景工作狀態
+  GET  /result/<id>   — 取背景工作結果
+  POST /analyze       — 單句語法分析
+  POST /vocab         — 從逐字稿提取詞彙
+  POST /word_card     — 單詞卡片
+  POST /simplify      — 句子簡化
+
+開發時 `python -m services.app`；正式環境走 wsgi.py（見 run.sh）。
+"""
+
+import json
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from flask import Flask, Response, jsonify, render_template, request
+
+load_dotenv()
+
+
+def create_app():
+    app = Flask(
+        __name__,
+        template_folder="../templates",
+        static_folder="../static",
+    )
+
+    from services import enhanced_transcriber
+    from services.language_analyzer import LanguageAnalyzer
+    from services.video_processor import VideoProcessor
+    from services.vocab_extractor import HybridVocabExtractor
+    from services import vocabulary_service
+
+    processor = VideoProcessor()
+    analyzer = LanguageAnalyzer()
+    extractor = HybridVocabExtractor()
+
+    # RAG chain 與 Whisper 模型在背景預熱，首位使用者不用等冷啟動
+    from services import grammar_rag_analysis
+
+    threading.Thread(target=grammar_rag_analysis.warmup, daemon=True).start()
+    threading.Thread(target=enhanced_transcriber.get_model, daemon=True).start()
+
+    @app.route("/")
+    def index():
+        return render_template("index.html")
+
+    @app.route("/process", methods=["POST"])
+    def process():
+        payload = request.get_json(force=True)
+        url = payload.get("url", "")
+        task = payload.get("task", "transcribe")
+        if not url:
+            return jsonify({"error": "缺少 url"}), 400
+
+        def _ndjson(obj):
+            return json.dumps(obj, ensure_ascii=False) + "\n"
+
+        def generate():
+            session_id = uuid.uuid4().hex[:8]
+            # 下載丟背景、同時把模型載起來：網路時間遮掉模型冷啟動
+            audio_future = processor.extract_audio_async(url, session_id=session_id)
+            yield _ndjson({"status": "downloading"})
+            enhanced_transcriber.get_model()
+            audio_path = audio_future.result()
+            yield _ndjson({"status": "transcribing"})
+            if task == "transcribe":
+                for chunk in enhanced_transcriber.transcribe_audio(audio_path):
+                    yield _ndjson(chunk)
+            elif task == "transcribe_and_analyze":
+                # 轉錄完的段落立刻丟給語法分析 worker，
+                # 分析跟轉錄尾端重疊，不用等整份逐字稿才開始
+                seg_q = queue.Queue()
+                out_q = queue.Queue()
+
+                def _analyze_worker():
+                    # sentinel 一定要放：worker 掛掉而沒放的話，
+                    # 下面的 out_q.get() 會把這條回應永遠吊著
+                    try:
+                        while True:
+                            seg_text = seg_q.get()
+                            if seg_text is None:
+                                break
+                            for result in analyzer.analyze_text_batch(seg_text):
+                                out_q.put(result)
+                    except Exception as exc:
+                        out_q.put({"error": f"分析失敗：{exc}"})
+                    finally:
+                        out_q.put(None)
+
+                worker = threading.Thread(target=_analyze_worker, daemon=True)
+                worker.start()
+
+                # worker 可能在轉錄途中就掛掉（Ollama 不在等）；
+                # 中途的 drain 吃到 sentinel 要記下來，
+                # 不然最後的 out_q.get() 會等一個永遠不來的 None
+                worker_done = False
+                for chunk in enhanced_transcriber.transcribe_audio(audio_path):
+                    seg_q.put(chunk["text"])
+                    yield _ndjson({"stage": "transcribe", **chunk})
+                    # 有分析結果就交錯吐出，沒有就不等
+                    while True:
+                        try:
+                            result = out_q.get_nowait()
+                        except queue.Empty:
+                            break
+                        if result is None:
+                            worker_done = True
+                        else:
+                            yield _ndjson({"stage": "analyze", **result})
+                seg_q.put(None)
+                while not worker_done:
+                    result = out_q.get()
+                    if result is None:
+                        break
+                    yield _ndjson({"stage": "analyze", **result})
+            yield _ndjson({"status": "done"})
+
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    # /process 串流會佔住一個 gunicorn worker 直到整條管線跑完；
+    # 不想掛著連線的客戶端改走 enqueue + poll：
+    # 長駐 thread pool 跑管線（CT2 模型單例在 process 內共用、
+    # 推論時會放開 GIL，開 process pool 反而要重載模型）。
+    # 狀態與結果都落地 temp/{job_id}/：gunicorn 開多個 worker，
+    # 輪詢幾乎都打到別的 process，記憶體 dict 看不到彼此的 job
+    job_pool = ThreadPoolExecutor(max_workers=2)
+
+    def _job_dir(job_id):
+        return os.path.join(processor.output_dir, job_id)
+
+    def _job_result_path(job_id):
+        return os.path.join(_job_dir(job_id), "result.json")
+
+    def _job_status_path(job_id):
+        return os.path.join(_job_dir(job_id), "status.json")
+
+    def _write_json(path, payload):
+        # 先寫 tmp 再 os.replace：讀端永遠只看得到完整檔案
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _set_job_status(job_id, payload):
+        os.makedirs(_job_dir(job_id), exist_ok=True)
+        _write_json(_job_status_path(job_id), payload)
+
+    def _run_job(job_id, url, task):
+        try:
+            audio_future = processor.extract_audio_async(url, session_id=job_id)
+            enhanced_transcriber.get_model()
+            audio_path = audio_future.result()
+            _set_job_status(job_id, {"status": "transcribing"})
+            chunks = list(enhanced_transcriber.transcribe_audio(audio_path))
+            result = {"segments": chunks}
+            if task == "transcribe_and_analyze":
+                _set_job_status(job_id, {"status": "analyzing"})
+                full_text = "\n".join(c["text"] for c in chunks)
+                result["analysis"] = sorted(
+                    analyzer.analyze_text_batch(full_text),
+                    key=lambda r: r["index"],
+                )
+            _write_json(_job_result_path(job_id), result)
+            _set_job_status(job_id, {"status": "done"})
+        except Exception as exc:
+            _set_job_status(job_id, {"status": "error", "error": str(exc)})
+
+    @app.route("/process_async", methods=["POST"])
+    def process_async():
+        payload = request.get_json(force=True)
+        url = payload.get("url", "")
+        task = payload.get("task", "transcribe")
+        if not url:
+            return jsonify({"error": "缺少 url"}), 400
+        job_id = uuid.uuid4().hex[:8]
+        _set_job_status(job_id, {"status": "queued"})
+        job_pool.submit(_run_job, job_id, url, task)
+        return jsonify({"job_id": job_id})
+
+    @app.route("/status/<job_id>")
+    def job_status(job_id):
+        status_path = _job_status_path(job_id)
+        try:
+            with open(status_path, "r", encoding="utf-8") as f:
+                return jsonify(json.load(f))
+        except FileNotFoundError:
+            pass
+        # 舊版只寫 result.json；結果檔在就算完成
+        if os.path.exists(_job_result_path(job_id)):
+            return jsonify({"status": "done"})
+        return jsonify({"error": "沒有這個 job"}), 404
+
+    @app.route("/result/<job_id>")
+    def job_result(job_id):
+        result_path = _job_result_path(job_id)
+        if not os.path.exists(result_path):
+            return jsonify({"error": "結果還沒好"}), 404
+        with open(result_path, "r", encoding="utf-8") as f:
+            return jsonify(json.load(f))
+
+    @app.route("/analyze", methods=["POST"])
+    def analyze():
+        payload = request.get_json(force=True)
+        text = payload.get("text", "").strip()
+        if not text:
+            return jsonify({"error": "缺少 text"}), 400
+
+        def generate():
+            for chunk in analyzer.analyze_text_batch(text):
+                yield json.dumps(chunk, ensure_ascii=False) + "\n"
+
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    @app.route("/vocab", methods=["POST"])
+    def vocab():
+        payload = request.get_json(force=True)
+        text = payload.get("text", "").strip()
+        if not text:
+            return jsonify({"error": "缺少 text"}), 400
+        return jsonify({"words": extractor.extract_vocab(text)})
+
+    @app.route("/word_card", methods=["POST"])
+    def word_card():
+        payload = request.get_json(force=True)
+        word = payload.get("word", "").strip()
+        if not word:
+            return jsonify({"error": "缺少 word"}), 400
+        return jsonify(vocabulary_service.get_word_card(word))
+
+    @app.route("/simplify", methods=["POST"])
+    def simplify():
+        payload = request.get_json(force=True)
+        text = payload.get("text", "").strip()
+        if not text:
+            return jsonify({"error": "缺少 text"}), 400
+        return jsonify(
+            vocabulary_service.simplify_text(text, payload.get("target_level", 2))
+        )
+
+    return app
+
+
+if __name__ == "__main__":
+    # 僅供本機開發；正式環境請用 gunicorn（run.sh）
+    create_app().run(debug=True, port=5001)
@@ -0,0 +1,389 @@
+"""
+加強版轉錄器
+
+faster-whisper 轉錄 + LLM 逐段校正 + 注音 ruby 標註。
+給 /process 的串流端點使用，邊轉錄邊吐結果。
+"""
+
+import json
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from faster_whisper import WhisperModel
+from opencc import OpenCC
+from pypinyin import pinyin, Style
+import numpy as np
+import ollama
+
+# ~1.5GB 的模型不在 import 時載：沒用到轉錄的請求（/vocab、/simplify）
+# 不該付這筆冷啟動；第一次真的要轉錄才載，之後全 process 共用一份
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
+# scripts/prepare_models.py 轉好的 int8 權重；存在就直接載，
+# 免去每次啟動時 CT2 現場重新量化
+_LOCAL_MODEL_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "models", "whisper-medium-int8"
+)
+
+
+def _pick_device():
+    """有 CUDA 就上 GPU；WHISPER_DEVICE 環境變數可強制指定"""
+    forced = os.getenv("WHISPER_DEVICE")
+    if forced:
+        return forced
+    try:
+        import ctranslate2
+
+        if ctranslate2.get_cuda_device_count() > 0:
+            return "cuda"
+    except Exception:
+        pass
+    return "cpu"
+
+
+def _compute_type():
+    """依 CPU 指令集挑量化格式。
+
+    有 AVX-512 VNNI（VPDPBUSD，一條指令做 int8 點積）的機器純 int8
+    吞吐最高；只有 AVX2 的舊機器 int8_float16 混合精度比較穩。
+    """
+    try:
+        import cpuinfo
+
+        flags = cpuinfo.get_cpu_info().get("flags", [])
+        if "avx512_vnni" in flags or "avx512vnni" in flags:
+            return "int8"
+        if "avx2" in flags:
+            return "int8_float16"
+    except ImportError:
+        pass
+    return "int8"
+
+
+def get_model():
+    global _MODEL
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            if _MODEL is None:
+                device = _pick_device()
+                # GPU 用 float16 吃 Tensor Core；VRAM 吃緊可用
+                # WHISPER_COMPUTE_TYPE=int8_float16（medium 約 980MiB）
+                compute_type = os.getenv("WHISPER_COMPUTE_TYPE") or (
+                    "float16" if device == "cuda" else _compute_type()
+                )
+                model_ref = (
+                    _LOCAL_MODEL_DIR if os.path.isdir(_LOCAL_MODEL_DIR) else "medium"
+                )
+                print(f"🎙️ 載入 faster-whisper 模型 ({model_ref}, {device}/{compute_type})...")
+                _MODEL = WhisperModel(
+                    model_ref,
+                    device=device,
+                    compute_type=compute_type,
+                    # 留一顆核心給 Flask/LLM 呼叫，避免轉錄吃滿整台機器
+                    cpu_threads=max(1, (os.cpu_count() or 2) - 1),
+                    num_workers=2,
+                )
+    return _MODEL
+
+
+# OpenCC 初始化要載字典（~100ms），延後到第一次真的要轉換才建
+_CC = None
+_CC_LOCK = threading.Lock()
+
+
+def _cc_convert(text):
+    global _CC
+    if _CC is None:
+        with _CC_LOCK:
+            if _CC is None:
+                _CC = OpenCC("s2twp")
+    return _CC.convert(text)
+
+
+# 「哪些字需要重轉」直接取自 OpenCC 自帶的 s2t 單字表：
+# 手挑清單一定漏字（漏一個就把簡體吐給使用者），
+# 查表只要微秒級，集合寧可取全
+@lru_cache(maxsize=1)
+def _simp_chars():
+    try:
+        import opencc as _opencc_pkg
+
+        path = os.path.join(
+            os.path.dirname(_opencc_pkg.__file__), "dictionary", "STCharacters.txt"
+        )
+        chars = set()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                # 只收轉換後真的會變字的 key
+                if len(parts) >= 2 and parts[1].split(" ")[0] != parts[0]:
+                    chars.add(parts[0])
+        return frozenset(chars)
+    except OSError:
+        return None
+
+
+def _has_simplified(text):
+    simp = _simp_chars()
+    if simp is None:
+        # 拿不到字表就保守處理：一律重轉
+        return True
+    return any(c in simp for c in text)
+
+# C 層 regex 掃描找中文字位置，比逐字元兩次 Python 比較快一個量級
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]")
+
+LLM_MODEL = "qwen2.5:7b"
+
+# 固定指令放 system message：每次呼叫的 system 前綴完全相同，
+# Ollama 的 prompt cache 可以直接重用已 prefill 的 KV，
+# 只有幾十 token 的 user 段需要重新計算
+CORRECTION_SYSTEM_PROMPT = """你是專業的台灣華語逐字稿校對員。以下是語音辨識的結果，可能含有同音錯字或漏字。
+請根據上下文修正「目前句子」，只輸出修正後的句子，不要解釋。
+規則：
+1. 保持原意，只改錯字與明顯漏字。
+2. 一律使用繁體中文（台灣用字）。
+3. 不要加標點以外的任何符號。"""
+
+CORRECTION_USER_TEMPLATE = """前一句：{prev}
+目前句子：{text}
+後一句：{next}"""
+
+# 校正是「長 prefill、短 decode」：壓小 context 與輸出上限、
+# 低溫小 top_k 讓決定性高；keep_alive 讓模型常駐不重載
+_CORRECTION_OPTIONS = {
+    "num_predict": 128,
+    "temperature": 0.2,
+    "top_k": 10,
+    "num_ctx": 1024,
+}
+_KEEP_ALIVE = "30m"
+
+
+BATCH_CORRECTION_SYSTEM_PROMPT = """你是專業的台灣華語逐字稿校對員。以下是語音辨識的結果，可能含有同音錯字或漏字。
+請依上下文逐句修正，輸出 JSON：{"corrections": [{"id": 編號, "text": 修正後句子}]}。
+規則：
+1. 保持原意，只改錯字與明顯漏字。
+2. 一律使用繁體中文（台灣用字）。
+3. 不要加標點以外的任何符號。"""
+
+_CORRECTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "corrections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "text": {"type": "string"},
+                },
+                "required": ["id", "text"],
+            },
+        }
+    },
+    "required": ["corrections"],
+}
+
+# 每批句數：共用的指令 prompt 一次 prefill 攤給整批句子
+CORRECTION_WINDOW = 8
+
+
+def _is_confident(seg):
+    """Whisper 自己就很有把握的段落，LLM 校正幾乎不會改字。
+
+    乾淨音源下這條門檻能省掉六到八成的校正呼叫。
+    """
+    return seg.avg_logprob > -0.25 and seg.no_speech_prob < 0.1
+
+
+def _needs_correction(text):
+    """非中文為主的段落（音樂、英文）不用校正。
+
+    UTF-32LE 編碼一次，codepoint 比較全在 numpy 的 C/SIMD 層跑，
+    不用兩趟 Python 字元迴圈。
+    """
+    if not text:
+        return False
+    arr = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    chinese_chars = int(((arr >= 0x4E00) & (arr <= 0x9FFF)).sum())
+    total_chars = int((arr > 0x20).sum())
+    return total_chars > 0 and chinese_chars / total_chars >= 0.5
+
+
+def correct_transcripts_batch(texts):
+    """一個 LLM 呼叫校正一批段落，回傳與輸入同長、同序的 list。
+
+    逐段各打一次 ollama.chat 時，幾百 token 的指令 prompt 每段都要
+    重新 prefill；整批編號送一次，prefill 成本攤平成 1/N。
+    句子照原順序編號，模型在批內就拿得到前後文。
+    """
+    results = list(texts)
+    need = [i for i, t in enumerate(texts) if _needs_correction(t)]
+    if not need:
+        return results
+
+    numbered = "\n".join(f"{n + 1}) {texts[i]}" for n, i in enumerate(need))
+    try:
+        response = ollama.chat(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": BATCH_CORRECTION_SYSTEM_PROMPT},
+                {"role": "user", "content": numbered},
+            ],
+            format=_CORRECTIONS_SCHEMA,
+            # 批次要裝下 system prompt + 8 句原文 + JSON 回聲，
+            # 單句用的 1024 context 會把指令擠出窗外
+            options={**_CORRECTION_OPTIONS, "num_predict": 1024, "num_ctx": 4096},
+            keep_alive=_KEEP_ALIVE,
+        )
+        corrections = json.loads(response["message"]["content"])["corrections"]
+    except Exception:
+        # 校正是加分項：Ollama 連不上或回應壞掉都吐原文，
+        # 別讓 window future 的例外把整條 /process 串流炸掉
+        return results
+
+    for c in corrections:
+        n = c.get("id", 0) - 1
+        if not 0 <= n < len(need):
+            continue
+        i = need[n]
+        corrected = (c.get("text") or "").strip()
+        # LLM 偶爾會多話，太長就退回原文
+        if corrected and len(corrected) <= len(texts[i]) * 2:
+            results[i] = corrected
+    return results
+
+
+def correct_transcript(text, prev_text="", next_text=""):
+    """請 LLM 根據前後文校正單一段落。
+
+    長音源裡的口頭禪（「大家好」「歡迎回來」）會反覆出現，
+    校正結果照 (句子, 前文尾, 後文頭) 快取；前後文各取 20 字
+    提高命中率，又不至於丟失有用的語境。
+    """
+    if not _needs_correction(text):
+        return text
+    try:
+        return _correct_cached(text, prev_text[-20:], next_text[:20])
+    except Exception:
+        # 在 lru_cache 外面接：吐原文但不把失敗釘進快取，下次還會重試
+        return text
+
+
+@lru_cache(maxsize=4096)
+def _correct_cached(text, prev_tail, next_head):
+    response = ollama.chat(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": CORRECTION_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": CORRECTION_USER_TEMPLATE.format(
+                    prev=prev_tail, text=text, next=next_head
+                ),
+            },
+        ],
+        options=_CORRECTION_OPTIONS,
+        keep_alive=_KEEP_ALIVE,
+    )
+    corrected = response["message"]["content"].strip()
+    # LLM 偶爾會多話，太長就退回原文
+    if not corrected or len(corrected) > len(text) * 2:
+        return text
+    return corrected
+
+
+def _ruby_text(text):
+    """逐字標注音，非中文字元留空。
+
+    整段中文字一次丟 pinyin()：詞典是片語層級的前綴比對，
+    整串輸入才攤得平查表成本，破音字也因為保留詞境而標得更準；
+    逐字呼叫則是 N 次 Python 函式開銷 + 全部退化成單字查表。
+    """
+    cjk_positions = {m.start() for m in _CJK_RE.finditer(text)}
+    if cjk_positions:
+        cjk_text = "".join(text[i] for i in sorted(cjk_positions))
+        zhuyins = iter(
+            p[0] for p in pinyin(cjk_text, style=Style.BOPOMOFO, heteronym=False)
+        )
+    else:
+        zhuyins = iter(())
+    return [
+        {"char": char, "zhuyin": next(zhuyins, "") if i in cjk_positions else ""}
+        for i, char in enumerate(text)
+    ]
+
+
+def transcribe_audio(audio_path):
+    """轉錄 + 校正，generator 逐段 yield 進度"""
+    segments, info = get_model().transcribe(
+        audio_path,
+        language="zh",
+        # beam=1 讓 decoder FLOPs 隨 beam 寬度線性縮減；
+        # 溫度 fallback 留兩檔就夠，六檔平均要重跑 decoder ~2x
+        beam_size=1,
+        best_of=1,
+        patience=1.0,
+        vad_filter=True,
+        temperature=[0.0, 0.4],
+        initial_prompt="以下是普通話的句子，請使用繁體中文。",
+    )
+
+    duration = info.duration or 1.0
+
+    def _correct_window(window):
+        texts = [_cc_convert(s.text.strip()) for s in window]
+        # 高信心段直接採用，剩下的才進批次校正
+        to_fix = [j for j, s in enumerate(window) if not _is_confident(s)]
+        corrected_window = list(texts)
+        if to_fix:
+            fixed = correct_transcripts_batch([texts[j] for j in to_fix])
+            for j, fixed_text in zip(to_fix, fixed):
+                corrected_window[j] = fixed_text
+        return corrected_window
+
+    # list + join：每段 += 會重配整條字串，一小時的片源是 O(N²) 搬運
+    buf = []
+
+    def _emit(window, future):
+        for seg, corrected in zip(window, future.result()):
+            # 進 LLM 前已轉過繁體；只有校正真的摻出簡體字才需要重轉
+            if _has_simplified(corrected):
+                corrected = _cc_convert(corrected)
+
+            buf.append(f"[{seg.start:.1f}s] {corrected}\n")
+
+            yield {
+                "start": seg.start,
+                "end": seg.end,
+                "text": corrected,
+                "ruby": _ruby_text(corrected),
+                "transcript": "".join(buf),
+                "progress": min(seg.end / duration, 1.0),
+            }
+
+    # 不先收完整份逐字稿：Whisper 每湊滿一個 window 就丟去校正，
+    # 已完成的 window 立刻照順序吐出——第一批結果只要等幾段轉錄，
+    # 不用等整個檔案跑完；校正與轉錄尾端完全重疊
+    max_workers = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        window = []
+        for seg in segments:
+            window.append(seg)
+            if len(window) == CORRECTION_WINDOW:
+                pending.append((window, pool.submit(_correct_window, window)))
+                window = []
+            # 吐已完成的 window，不阻塞還在跑的轉錄
+            while pending and pending[0][1].done():
+                yield from _emit(*pending.popleft())
+        if window:
+            pending.append((window, pool.submit(_correct_window, window)))
+        while pending:
+            yield from _emit(*pending.popleft())
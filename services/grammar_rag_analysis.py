@@ -0,0 +1,323 @@
+"""
+語法點 RAG 分析
+
+用 FAISS + Ollama 檢索最相關的語法點，讓 LLM 產出
+拼音、注音、翻譯與文法說明的完整分析。
+"""
+
+import os
+import re
+import json
+import mmap
+import atexit
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import httpx
+import numpy as np
+from pypinyin import pinyin, Style
+from pypinyin.contrib.tone_convert import to_bopomofo
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_ollama import ChatOllama
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+
+GRAMMAR_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "grammar_analysis", "grammar_corpus_cleaned.txt"
+)
+
+EMBED_MODEL = "nomic-embed-text"
+LLM_MODEL = "qwen2.5:7b"
+
+ANALYSIS_PROMPT = ChatPromptTemplate.from_template(
+    """你是教外國學生的台灣華語老師。請分析以下句子，參考檢索到的語法點資料。
+
+句子：{sentence}
+
+相關語法點資料：
+{context}
+
+請輸出 JSON，包含以下欄位：
+translation（英文翻譯）、grammar_point（語法點名稱）、explanation（文法說明，英文）、
+examples（兩個例句，繁體中文加英文翻譯）、logic（句子結構的邏輯分析，英文）。
+只輸出 JSON。"""
+)
+
+_CACHED_CHAIN = None
+_JSON_DECODER = json.JSONDecoder()
+
+# 固定欄位一次 format，不走 list-append + join
+_OUTPUT_TEMPLATE = """📌 句子：{sentence}
+🔤 拼音：{pinyin}
+🈶 注音：{zhuyin}
+🌍 翻譯：{translation}"""
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+# 所有 Ollama HTTP 流量共用一個 pool：keep-alive 之下
+# 每次 analyze_grammar_point 的 embedding+chat 不用各付一次握手
+# （Ollama 只講明文 HTTP/1.1，h2 協商不會發生，不開 http2）
+_HTTP_CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(retries=3),
+    limits=httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0),
+    timeout=httpx.Timeout(300.0, connect=10.0),
+)
+atexit.register(_HTTP_CLIENT.close)
+
+
+class BatchedOllamaEmbeddings(Embeddings):
+    """走 Ollama 原生 /api/embed 批次端點的 embedding client。
+
+    LangChain 的 OllamaEmbeddings 歷史上是一篇文件一個 HTTP 請求打舊的
+    /api/embeddings；/api/embed 一次吃整批 input，對 ~7000 行語料可以把
+    索引時間砍掉一大半。embed_query 留在 /api/embeddings 保持相容。
+    """
+
+    def __init__(self, model=EMBED_MODEL, base_url=OLLAMA_BASE_URL, batch_size=32, client=None):
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self._client = client or _HTTP_CLIENT
+
+    def _embed_one(self, text):
+        resp = self._client.post(
+            f"{self.base_url}/api/embeddings",
+            json={"model": self.model, "prompt": text},
+        )
+        resp.raise_for_status()
+        return resp.json()["embedding"]
+
+    def embed_documents(self, texts):
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            chunk = texts[i:i + self.batch_size]
+            resp = self._client.post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.model, "input": chunk},
+            )
+            resp.raise_for_status()
+            embeddings = resp.json().get("embeddings")
+            if embeddings is None:
+                # 舊版 Ollama 沒有 /api/embed，退回逐篇
+                embeddings = [self._embed_one(t) for t in chunk]
+            vectors.extend(embeddings)
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_one(text)
+
+
+def create_ollama_embeddings():
+    return BatchedOllamaEmbeddings()
+
+
+def create_llm():
+    return ChatOllama(model=LLM_MODEL, format="json", temperature=0.3)
+
+
+def _hnsw_store(embeddings, documents, vectors):
+    """HNSW(M=32) + cosine 的 FAISS store。
+
+    from_embeddings 預設 IndexFlatL2，每個查詢都是整表線性掃描；
+    HNSW 在這個語料規模下查詢時間 sub-linear、recall 幾乎不掉。
+    """
+    arr = np.asarray(vectors, dtype="float32")
+    faiss.normalize_L2(arr)
+    # SQ8：向量以 int8 存，記憶體減半、距離計算吃更寬的 SIMD lane；
+    # 向量已先正規化，inner product 等同 cosine，query 端維持 fp32
+    index = faiss.index_factory(arr.shape[1], "HNSW32,SQ8", faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = 200
+    index.hnsw.efSearch = 64
+    index.train(arr)
+    index.add(arr)
+    docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(documents)})
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id={i: str(i) for i in range(len(documents))},
+        normalize_L2=True,
+    )
+
+
+@dataclass
+class GrammarCorpus:
+    """SoA 版語料：平行的 texts / levels 欄位。
+
+    一串 Document 物件（各自帶一個 metadata dict）對批次操作不友善；
+    分桶、切片都在 numpy 層做，Document 等到 FAISS 真正需要才生。
+    """
+
+    texts: list
+    levels: np.ndarray
+
+
+def _load_corpus(grammar_file_path=GRAMMAR_FILE):
+    # mmap 讓 OS page cache 當資料本體：不複製整個檔成 Python str，
+    # 只 decode 非空的 chunk
+    with open(grammar_file_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        raw_chunks = mm.split(b"---")
+
+    texts = []
+    levels = []
+    for raw in raw_chunks:
+        chunk = raw.decode("utf-8", "ignore").strip()
+        if not chunk:
+            continue
+        level = 0
+        if "第" in chunk and "級" in chunk:
+            for lv in range(1, 10):
+                if f"第{lv}級" in chunk or f"第{lv}*級" in chunk:
+                    level = lv
+                    break
+        texts.append(chunk)
+        levels.append(level)
+    return GrammarCorpus(texts=texts, levels=np.asarray(levels, dtype=np.int16))
+
+
+def build_vector_store(grammar_file_path=GRAMMAR_FILE):
+    """載入語法語料並建 FAISS 索引"""
+    corpus = _load_corpus(grammar_file_path)
+    embeddings = create_ollama_embeddings()
+    vectors = embeddings.embed_documents(corpus.texts)
+
+    documents = [
+        Document(page_content=text, metadata={"level": int(level)})
+        for text, level in zip(corpus.texts, corpus.levels)
+    ]
+    vectorstore = _hnsw_store(embeddings, documents, vectors)
+
+    # level 是小整數枚舉：每個等級各建一個子索引（重用同一批向量）。
+    # LangChain 的 filter 是 ANN 搜完才後過濾，會白算距離還可能湊不滿 k；
+    # 子索引直接搜小表，top-k 品質完整
+    level_stores = {}
+    for level in np.unique(corpus.levels):
+        idxs = np.where(corpus.levels == level)[0]
+        level_stores[int(level)] = FAISS.from_embeddings(
+            [(corpus.texts[i], vectors[i]) for i in idxs],
+            embeddings,
+            metadatas=[{"level": int(level)} for _ in idxs],
+        )
+    return vectorstore, level_stores
+
+
+_CHAIN_LOCK = threading.Lock()
+
+
+def get_rag_chain(grammar_file_path=GRAMMAR_FILE):
+    """建一次 chain 之後重用；double-checked locking 防止
+    多個首發請求同時各建一份"""
+    global _CACHED_CHAIN
+    if _CACHED_CHAIN is None:
+        with _CHAIN_LOCK:
+            if _CACHED_CHAIN is None:
+                vectorstore, level_stores = build_vector_store(grammar_file_path)
+                llm = create_llm()
+                _CACHED_CHAIN = {
+                    "vectorstore": vectorstore,
+                    "level_stores": level_stores,
+                    "llm": llm,
+                }
+    return _CACHED_CHAIN
+
+
+def warmup(grammar_file_path=GRAMMAR_FILE):
+    """process 啟動時先把 chain 建好，第一個使用者不用吞冷啟動延遲"""
+    try:
+        get_rag_chain(grammar_file_path)
+        print("🔥 RAG chain 預熱完成")
+    except Exception as e:
+        # Ollama 還沒起來等情況：留給第一個請求 lazy 建
+        print(f"⚠️ RAG chain 預熱失敗，改為首次請求時建立：{e}")
+
+
+_HAN_RE = re.compile(r"[\u4e00-\u9fa5]")
+
+
+@lru_cache(maxsize=65536)
+def _char_phonetics(ch):
+    """單字的（拼音, 注音）。同一部影片的字重複率很高，
+    memo 之後 pypinyin 的 trie 每個字只走一次"""
+    py = pinyin(ch, style=Style.TONE, heteronym=False, strict=False)[0][0]
+    return py, to_bopomofo(py)
+
+
+def _phonetics(text):
+    """整句的拼音與注音字串，非中文字元跳過"""
+    pys = []
+    zys = []
+    for ch in text:
+        if _HAN_RE.match(ch):
+            py, zy = _char_phonetics(ch)
+            pys.append(py)
+            zys.append(zy)
+    return " ".join(pys), " ".join(zys)
+
+
+# 注音/拼音跟 LLM 呼叫互相獨立，丟到小 pool 跟推論重疊
+_PHONETICS_POOL = ThreadPoolExecutor(max_workers=2)
+
+
+@lru_cache(maxsize=1024)
+def _cached_query_vector(query):
+    """同一句重查（使用者改逐字稿重送很常見）直接吃快取，
+    省掉一整趟 Ollama embedding"""
+    return tuple(get_rag_chain()["vectorstore"].embedding_function.embed_query(query))
+
+
+def retrieve_with_filter(chain, query, level=None, k=5):
+    vector = list(_cached_query_vector(query))
+    if level is not None and level in chain["level_stores"]:
+        return chain["level_stores"][level].similarity_search_by_vector(vector, k=k)
+    return chain["vectorstore"].similarity_search_by_vector(vector, k=k)
+
+
+def analyze_grammar_point(transcription, level=None):
+    """分析一句話的語法點，回傳給前端的整段文字"""
+    chain = get_rag_chain()
+
+    # 音標在背景算，end-to-end 變成 max(音標, LLM) 而不是兩者相加
+    phonetics_future = _PHONETICS_POOL.submit(_phonetics, transcription)
+
+    docs = retrieve_with_filter(chain, transcription, level=level)
+    context = "\n\n".join(d.page_content for d in docs)
+
+    response = chain["llm"].invoke(
+        ANALYSIS_PROMPT.format_messages(sentence=transcription, context=context)
+    )
+    pinyin_str, zhuyin_str = phonetics_future.result()
+    raw_json_str = response.content
+    # 從第一個 '{' 直接 raw_decode：不用剝 ```json 圍欄、不複製字串，
+    # 模型多話（前言、尾註）也照樣解得出來
+    idx = raw_json_str.find("{")
+    if idx == -1:
+        data = {"translation": "", "explanation": raw_json_str.strip()}
+    else:
+        try:
+            data, _ = _JSON_DECODER.raw_decode(raw_json_str, idx)
+        except json.JSONDecodeError:
+            data = {"translation": "", "explanation": raw_json_str.strip()}
+
+    output = _OUTPUT_TEMPLATE.format(
+        sentence=transcription,
+        pinyin=pinyin_str,
+        zhuyin=zhuyin_str,
+        translation=data.get("translation", ""),
+    )
+    if data.get("grammar_point"):
+        output += f"\n📖 語法點：{data['grammar_point']}"
+    if data.get("explanation"):
+        output += f"\n💡 說明：{data['explanation']}"
+    examples = data.get("examples") or []
+    if examples:
+        output += "".join(f"\n　・{ex}" for ex in examples)
+    if data.get("logic"):
+        output += f"\n🧩 邏輯：{data['logic']}"
+    return output
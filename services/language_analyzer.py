@@ -0,0 +1,194 @@
+"""
+語言分析器
+
+包住 LLM 的高階分析入口：整段文本的詞彙/語法摘要（OpenAI 或 Ollama），
+逐行語法點分析（走 RAG），以及逐段句子分析。
+"""
+
+import os
+import json
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ollama
+
+from services.grammar_rag_analysis import analyze_grammar_point
+
+LLM_MODEL = "qwen2.5:7b"
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+VOCAB_PROMPT = """請從以下文本挑出 10 個對華語學習者最有價值的詞彙，
+輸出 JSON 陣列，每個元素含 word、pinyin、english。只輸出 JSON。
+
+文本：{text}"""
+
+GRAMMAR_PROMPT = """請從以下文本找出 5 個重要語法點，
+輸出 JSON 陣列，每個元素含 pattern、explanation（英文）、example。只輸出 JSON。
+
+文本：{text}"""
+
+SENTENCE_PROMPT = """你是台灣華語老師。請分析這句話，輸出 JSON：
+pinyin（整句拼音）、translation（英文翻譯）、grammar（文法重點，英文）。只輸出 JSON。
+
+句子：{sentence}"""
+
+# Ollama 走 schema 約束輸出：不產生 ```json 圍欄、不夾說明文字，
+# num_predict 上限也讓生成早點停
+_SENTENCE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "pinyin": {"type": "string"},
+        "translation": {"type": "string"},
+        "grammar": {"type": "string"},
+    },
+    "required": ["pinyin", "translation", "grammar"],
+}
+
+
+def _parse_json(content, default=None):
+    content = _FENCE_RE.sub("", content.strip())
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return default if default is not None else []
+
+
+class LanguageAnalyzer:
+    def __init__(self):
+        self.use_openai = bool(os.getenv("OPENAI_API_KEY")) and not os.getenv("USE_OLLAMA")
+        if self.use_openai:
+            from openai import OpenAI
+
+            self.client = OpenAI()
+
+    def _chat(self, prompt, schema=None, num_predict=None):
+        if self.use_openai:
+            resp = self.client.chat.completions.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}]
+            )
+            return resp.choices[0].message.content
+        options = {"num_predict": num_predict} if num_predict else None
+        resp = ollama.chat(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            format=schema,
+            options=options,
+        )
+        return resp["message"]["content"]
+
+    async def _achat(self, prompt, schema=None, num_predict=None):
+        if self.use_openai:
+            # async client 每次呼叫現建（跟下面的 AsyncClient 一樣）：
+            # 連線池綁在建立時的 event loop 上，跨 asyncio.run 重用
+            # 會在第二次呼叫炸 "Event loop is closed"
+            from openai import AsyncOpenAI
+
+            resp = await AsyncOpenAI().chat.completions.create(
+                model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}]
+            )
+            return resp.choices[0].message.content
+        options = {"num_predict": num_predict} if num_predict else None
+        resp = await ollama.AsyncClient().chat(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            format=schema,
+            options=options,
+        )
+        return resp["message"]["content"]
+
+    async def _extract_vocabulary(self, text):
+        return _parse_json(await self._achat(VOCAB_PROMPT.format(text=text)))
+
+    async def _extract_grammar_points(self, text):
+        return _parse_json(await self._achat(GRAMMAR_PROMPT.format(text=text)))
+
+    def analyze(self, text):
+        """整段文本的詞彙 + 語法摘要。
+
+        兩個 LLM 呼叫彼此獨立，gather 同時發出，
+        牆鐘時間是 max(詞彙, 語法) 而不是相加；Flask 端維持同步介面。
+        """
+
+        async def _run():
+            return await asyncio.gather(
+                self._extract_vocabulary(text), self._extract_grammar_points(text)
+            )
+
+        vocabulary, grammar_points = asyncio.run(_run())
+        return {"vocabulary": vocabulary, "grammar_points": grammar_points}
+
+    def analyze_sentence(self, sentence):
+        """單句分析，回傳 JSON dict"""
+        data = _parse_json(
+            self._chat(
+                SENTENCE_PROMPT.format(sentence=sentence),
+                schema=_SENTENCE_SCHEMA,
+                num_predict=300,
+            ),
+            default={},
+        )
+        data["sentence"] = sentence
+        return data
+
+    async def analyze_sentence_async(self, sentence):
+        """analyze_sentence 的非同步版，供批次 gather 用"""
+        data = _parse_json(
+            await self._achat(
+                SENTENCE_PROMPT.format(sentence=sentence),
+                schema=_SENTENCE_SCHEMA,
+                num_predict=300,
+            ),
+            default={},
+        )
+        data["sentence"] = sentence
+        return data
+
+    def analyze_all(self, asr_data):
+        """逐段分析整份轉錄結果。
+
+        每段是獨立的 LLM round-trip，串行要等 N 趟；gather 讓同時在途
+        的請求數吃滿 OLLAMA_NUM_PARALLEL，回傳順序跟 segments 一致。
+        """
+        segments = asr_data["segments"]
+        max_concurrency = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+        async def _run():
+            sem = asyncio.Semaphore(max_concurrency)
+
+            async def _one(seg):
+                async with sem:
+                    return await self.analyze_sentence_async(seg["text"])
+
+            return await asyncio.gather(*[_one(seg) for seg in segments])
+
+        return asyncio.run(_run())
+
+    def analyze_text_batch(self, text):
+        """逐行走 RAG 語法分析，generator 逐行 yield 進度。
+
+        每行是一次獨立的 LLM round-trip，30 行逐字稿串行要等 30 趟；
+        改成 thread pool 同時在途（上限對齊 OLLAMA_NUM_PARALLEL），
+        完成一行吐一行。index 帶給前端自行排序。
+        """
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        total = len(lines)
+        if not lines:
+            return
+        max_workers = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            future_map = {
+                pool.submit(analyze_grammar_point, line): (i, line)
+                for i, line in enumerate(lines)
+            }
+            done = 0
+            for future in as_completed(future_map):
+                i, line = future_map[future]
+                done += 1
+                yield {
+                    "index": i,
+                    "line": line,
+                    "analysis": future.result(),
+                    "progress": done / total,
+                }
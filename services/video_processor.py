@@ -0,0 +1,60 @@
+"""
+YouTube 影片下載 / 音訊抽取
+
+用 yt-dlp 抓最佳音訊軌，解成 16kHz 單聲道 WAV 給 Whisper 轉錄用。
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import yt_dlp
+
+TEMP_DIR = os.path.join(os.path.dirname(__file__), "..", "temp")
+
+# 下載是純網路 I/O，丟背景 thread 讓呼叫端同時做別的事
+# （載模型、暖 jieba）；兩個 worker 夠用又不會打爆出口頻寬
+_DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=2)
+
+
+class VideoProcessor:
+    def __init__(self, output_dir=TEMP_DIR):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def extract_audio_from_url(self, url, session_id="audio"):
+        """下載 YouTube 音訊並解成 16kHz 單聲道 WAV，回傳檔案路徑。
+
+        Whisper 內部就是吃 16kHz mono PCM：以前轉 mp3@192k 是
+        「解碼 + 重新壓縮」整趟白做，還要在轉錄時再解一次；
+        直接解成目標取樣率的 WAV 省掉整個編碼段。
+        """
+        out_tmpl = os.path.join(self.output_dir, f"{session_id}.%(ext)s")
+        ydl_opts = {
+            "format": "bestaudio/best",
+            "outtmpl": out_tmpl,
+            "postprocessors": [
+                {
+                    "key": "FFmpegExtractAudio",
+                    "preferredcodec": "wav",
+                    "preferredquality": "0",
+                }
+            ],
+            "postprocessor_args": ["-ar", "16000", "-ac", "1"],
+            "quiet": True,
+            "noplaylist": True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+        audio_path = os.path.join(self.output_dir, f"{session_id}.wav")
+        print(f"🎵 音訊下載完成：{info.get('title', url)} -> {audio_path}")
+        return audio_path
+
+    def extract_audio_async(self, url, session_id="audio"):
+        """extract_audio_from_url 的背景版，回傳 Future。
+
+        呼叫端在等下載的同時可以先把 Whisper 模型載起來，
+        網路時間跟模型冷啟動互相遮掉。
+        """
+        return _DOWNLOAD_POOL.submit(
+            self.extract_audio_from_url, url, session_id
+        )
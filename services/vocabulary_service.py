@@ -0,0 +1,557 @@
+"""
+詞彙卡片與簡化句服務
+
+get_word_card：查 COCT 等級、語料例句、拼音注音，再請 LLM 補解釋。
+simplify_text：偵測句中超過目標等級的詞，請 LLM 改寫成簡單版本。
+"""
+
+import os
+import json
+import random
+import pickle
+import sqlite3
+import asyncio
+import threading
+from functools import lru_cache
+
+import ollama
+from opencc import OpenCC
+from pypinyin import pinyin, Style
+
+# 斷詞器跟 extractor 共用同一個實例：有 jieba_fast 就用 C 版，
+# 詞典也吃 chunk 預熱過的那份，不另載一套冷的純 Python jieba
+from services.vocab_extractor import HybridVocabExtractor, jieba
+
+CORPUS_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "grammar_analysis", "grammar_corpus_cleaned.txt"
+)
+
+LLM_MODEL = "qwen2.5:7b"
+
+# 沒有難詞時只差一句英譯，用 2B 小模型就夠，不用動到 7B
+QUICK_LLM_MODEL = "gemma2:2b"
+
+QUICK_TRANSLATE_PROMPT = "請把這句中文翻成英文，只輸出譯文：{text}"
+
+CARD_PROMPT = """你是台灣華語老師。請為「{word}」這個詞產生 JSON：
+definition（英文解釋）、example（一個例句，繁體中文）、example_translation（例句英譯）。
+只輸出 JSON，不要其他文字。"""
+
+CARDS_PROMPT = """你是台灣華語老師。請為以下每個詞產生卡片：{words}。
+輸出 JSON，格式為 {{"cards": [...]}}，每張卡片含
+word（詞）、definition（英文解釋）、example（一個例句，繁體中文）、
+example_translation（例句英譯）。只輸出 JSON。"""
+
+# schema 約束輸出，省掉圍欄剝殼；拼音注音回本地 pypinyin 算，
+# 不浪費模型 token 也不會拼錯
+_CARD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "definition": {"type": "string"},
+        "example": {"type": "string"},
+        "example_translation": {"type": "string"},
+    },
+    "required": ["definition", "example", "example_translation"],
+}
+
+_SIMPLIFY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "original": {"type": "string"},
+        "simplified": {"type": "string"},
+        "english_translation": {"type": "string"},
+        "changes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "from": {"type": "string"},
+                    "to": {"type": "string"},
+                },
+                "required": ["from", "to"],
+            },
+        },
+    },
+    "required": ["original", "simplified", "english_translation", "changes"],
+}
+
+_CARDS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "cards": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "word": {"type": "string"},
+                    "definition": {"type": "string"},
+                    "example": {"type": "string"},
+                    "example_translation": {"type": "string"},
+                },
+                "required": ["word", "definition", "example", "example_translation"],
+            },
+        }
+    },
+    "required": ["cards"],
+}
+
+SIMPLIFY_PROMPT = """你是台灣華語老師。以下句子含有較難的詞：{hard_words}。
+請改寫成等級 {target_level} 以下學生能懂的句子，輸出 JSON：
+original（原句）、simplified（簡化句，繁體中文）、english_translation（英譯）、
+changes（陣列，每個元素含 from、to）。只輸出 JSON。
+
+句子：{text}"""
+
+_extractor = HybridVocabExtractor()
+
+# C++ trie 轉換器建一次全模組共用，不要每次請求重建
+_CC = OpenCC("s2twp")
+
+# LLM 產出對同一個 (詞, 模型) 幾乎是確定的：
+# 記憶體 LRU 擋熱門詞，SQLite 讓重啟之後也不用重打 Ollama
+CACHE_DB_PATH = os.path.join(os.path.dirname(__file__), "card_cache.sqlite")
+_db_lock = threading.Lock()
+_db_conn = None
+
+
+def _cache_conn():
+    global _db_conn
+    if _db_conn is None:
+        _db_conn = sqlite3.connect(CACHE_DB_PATH, check_same_thread=False)
+        _db_conn.execute(
+            "CREATE TABLE IF NOT EXISTS cards(key TEXT PRIMARY KEY, json TEXT)"
+        )
+        _db_conn.commit()
+    return _db_conn
+
+
+def _cache_get(key):
+    with _db_lock:
+        row = _cache_conn().execute(
+            "SELECT json FROM cards WHERE key=?", (key,)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def _cache_put(key, value):
+    with _db_lock:
+        conn = _cache_conn()
+        conn.execute("INSERT OR REPLACE INTO cards VALUES(?, ?)", (key, value))
+        conn.commit()
+
+
+_SENT_END = ("。", "！", "？")
+
+# 語料只讀一次：啟動後第一個查詢載入並預切 block，
+# 順便用 extractor 的 Aho-Corasick 自動機建 詞 -> block 索引，
+# 之後查例句不必每次重讀 8MB 檔案再全文掃描
+_corpus_blocks = None
+_block_ids_by_word = None
+_corpus_lock = threading.Lock()
+
+
+_CORPUS_IDX_PATH = CORPUS_PATH + ".idx"
+
+
+def _load_corpus_blocks():
+    global _corpus_blocks, _block_ids_by_word
+    if _corpus_blocks is None:
+        with _corpus_lock:
+            if _corpus_blocks is None:
+                with open(CORPUS_PATH, "r", encoding="utf-8") as f:
+                    content = f.read()
+                blocks = [b for b in content.split("---") if b.strip()]
+                _block_ids_by_word = _load_or_build_index(blocks)
+                _corpus_blocks = blocks
+    return _corpus_blocks, _block_ids_by_word
+
+
+def _load_or_build_index(blocks):
+    """倒排索引建一次就 pickle 落地，之後的 worker 啟動毫秒級載回。
+
+    以語料檔 mtime 判斷快取是否過期；AC 掃描整份語料只在
+    語料真的變了才重跑。
+    """
+    try:
+        mtime = os.path.getmtime(CORPUS_PATH)
+        if os.path.getmtime(_CORPUS_IDX_PATH) >= mtime:
+            with open(_CORPUS_IDX_PATH, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("mtime") == mtime:
+                return cached["index"]
+    except (OSError, pickle.PickleError, EOFError):
+        pass
+
+    index = {}
+    if _extractor._ac is not None:
+        for bi, block in enumerate(blocks):
+            for _, w in _extractor._ac.iter(block):
+                index.setdefault(w, set()).add(bi)
+        try:
+            with open(_CORPUS_IDX_PATH, "wb") as f:
+                pickle.dump(
+                    {"mtime": os.path.getmtime(CORPUS_PATH), "index": index},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+        except OSError:
+            pass
+    return index
+
+
+# 收集到這個數量就停：隨機挑一句不需要窮舉整份語料的候選
+_MAX_EXAMPLES = 10
+
+
+def search_corpus_example(word):
+    """從語法語料裡找含有該詞的自然例句"""
+    blocks, index = _load_corpus_blocks()
+
+    # 詞表內的詞直接用倒排索引；表外詞才退回線性掃描
+    if index and _extractor._ac is not None and word in _extractor._ac:
+        candidate_ids = sorted(index.get(word, ()))
+    else:
+        candidate_ids = [i for i, b in enumerate(blocks) if word in b]
+
+    examples = []
+    for bi in candidate_ids:
+        block = blocks[bi]
+        if word not in block:
+            continue
+        for line in block.splitlines():
+            line = line.strip()
+            if word not in line:
+                continue
+            if not line.endswith(_SENT_END):
+                continue
+            # 純 str 方法取代錨定 regex：不跨 Python/C 邊界，每行省 3-5x
+            if line[:1].isdigit():
+                head, dot, rest = line.partition(".")
+                if dot and head.isdigit():
+                    line = rest.strip()
+            if len(line) >= 2 and "A" <= line[0] <= "Z" and line[1] == ".":
+                continue
+            if len(line) >= 2 and "A" <= line[0] <= "Z" and line[1] == "：":
+                line = line[2:]
+            if len(line) <= 40:
+                examples.append(line)
+                if len(examples) >= _MAX_EXAMPLES:
+                    return random.choice(examples)
+    return random.choice(examples) if examples else None
+
+
+def get_word_card(word):
+    """產生單詞卡：等級、拼音、注音、英文解釋、例句。
+
+    同一個詞的卡片內容穩定，先查快取（記憶體 LRU -> SQLite），
+    都沒中才真的跑 LLM。
+    """
+    return json.loads(_word_card_json(word))
+
+
+@lru_cache(maxsize=2048)
+def _word_card_json(word):
+    key = f"card:{word}"
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    card = _build_word_card(word)
+    payload = json.dumps(card, ensure_ascii=False)
+    _cache_put(key, payload)
+    return payload
+
+
+# 全形空白當哨兵：不是漢字，pypinyin 會原樣吐回來，方便切回各詞
+_SENTINEL = "　"
+
+
+def _split_on_sentinel(tokens):
+    groups, cur = [], []
+    for t in tokens:
+        if t == _SENTINEL:
+            groups.append(cur)
+            cur = []
+        else:
+            cur.append(t)
+    groups.append(cur)
+    return groups
+
+
+def _phonetics_for_words(words):
+    """一次 pinyin() 呼叫算完整份詞表的拼音與注音。
+
+    pypinyin 的詞典是全域的，但每次呼叫的 Python 層開銷對短詞來說
+    佔大宗；把詞用哨兵接起來一次算，再按哨兵位置切回來，
+    N 個詞的呼叫開銷變成 1 次。回傳 word -> (pinyin, zhuyin)。
+    """
+    if not words:
+        return {}
+    joined = _SENTINEL.join(words)
+    py_groups = _split_on_sentinel(p[0] for p in pinyin(joined, style=Style.TONE))
+    zy_groups = _split_on_sentinel(p[0] for p in pinyin(joined, style=Style.BOPOMOFO))
+    return {
+        word: (" ".join(py), " ".join(zy))
+        for word, py, zy in zip(words, py_groups, zy_groups)
+    }
+
+
+def get_word_cards(words):
+    """一次產生多張單詞卡。
+
+    extract_vocab 一次吐幾十個詞，逐詞打 LLM 要付幾十趟 HTTP +
+    prompt 開銷；這裡把快取沒中的詞併成一個 prompt、一次呼叫，
+    拼音注音等本地算得出來的欄位不佔模型 token。
+    單次批量失敗才退回逐詞併發呼叫。
+    """
+    cards_by_word = {}
+    misses = []
+    for word in words:
+        cached = _cache_get(f"card:{word}")
+        if cached is not None:
+            cards_by_word[word] = json.loads(cached)
+        else:
+            misses.append(word)
+
+    if misses:
+        try:
+            response = ollama.chat(
+                model=LLM_MODEL,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": CARDS_PROMPT.format(words="、".join(misses)),
+                    }
+                ],
+                format=_CARDS_SCHEMA,
+            )
+            llm_cards = {
+                c["word"]: c
+                for c in json.loads(response["message"]["content"])["cards"]
+                if c.get("word")
+            }
+        except (json.JSONDecodeError, KeyError):
+            llm_cards = _gather_cards(misses)
+
+        phonetics = _phonetics_for_words(misses)
+        for word in misses:
+            data = llm_cards.get(word, {})
+            py, zy = phonetics.get(word, ("", ""))
+            card = {
+                "word": word,
+                "level": _extractor._get_level(word),
+                "pinyin": py,
+                "zhuyin": zy,
+                "definition": data.get("definition", ""),
+                "example": search_corpus_example(word) or data.get("example", ""),
+                "example_translation": data.get("example_translation", ""),
+            }
+            _cache_put(f"card:{word}", json.dumps(card, ensure_ascii=False))
+            cards_by_word[word] = card
+
+    return [cards_by_word[word] for word in words]
+
+
+def _gather_cards(words, max_concurrency=4):
+    """批量失敗時的退路：逐詞非同步併發，semaphore 限制在途數"""
+
+    async def _run():
+        client = ollama.AsyncClient()
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def _one(word):
+            async with sem:
+                resp = await client.chat(
+                    model=LLM_MODEL,
+                    messages=[{"role": "user", "content": CARD_PROMPT.format(word=word)}],
+                    format="json",
+                )
+            try:
+                return word, json.loads(resp["message"]["content"])
+            except json.JSONDecodeError:
+                return word, {}
+
+        return dict(await asyncio.gather(*[_one(w) for w in words]))
+
+    return asyncio.run(_run())
+
+
+@lru_cache(maxsize=8192)
+def _pinyin_cached(word, style):
+    """pypinyin 每次查詢都要走幾百 KB 的片語詞典；
+    同一個詞重複查直接變 dict lookup"""
+    return " ".join(p[0] for p in pinyin(word, style=style))
+
+
+def _build_word_card(word):
+    level = _extractor._get_level(word)
+
+    py = _pinyin_cached(word, Style.TONE)
+    zy = _pinyin_cached(word, Style.BOPOMOFO)
+
+    corpus_example = search_corpus_example(word)
+
+    response = ollama.chat(
+        model=LLM_MODEL,
+        messages=[{"role": "user", "content": CARD_PROMPT.format(word=word)}],
+        format=_CARD_SCHEMA,
+        options={"num_predict": 300},
+    )
+    try:
+        data = json.loads(response["message"]["content"])
+    except json.JSONDecodeError:
+        data = {}
+
+    return {
+        "word": word,
+        "level": level,
+        "pinyin": py,
+        "zhuyin": zy,
+        "definition": data.get("definition", ""),
+        "example": corpus_example or data.get("example", ""),
+        "example_translation": data.get("example_translation", ""),
+    }
+
+
+def simplify_text(text, target_level=2):
+    """把含難詞的句子改寫成目標等級以下（同句同等級走快取）"""
+    return json.loads(_simplify_json(text, target_level))
+
+
+@lru_cache(maxsize=1024)
+def _simplify_json(text, target_level):
+    key = f"simplify:{target_level}:{text}"
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    data = _simplify_uncached(text, target_level)
+    payload = json.dumps(data, ensure_ascii=False)
+    _cache_put(key, payload)
+    return payload
+
+
+def _detect_hard_words(text, target_level):
+    detected = []
+    for w in jieba.cut(text):
+        lvl = _extractor._get_level(w)
+        if lvl is not None and lvl > target_level:
+            detected.append(w)
+    return detected
+
+
+def _simplify_messages(text, target_level, detected_hard_words):
+    return [
+        {
+            "role": "user",
+            "content": SIMPLIFY_PROMPT.format(
+                hard_words="、".join(detected_hard_words) or "（無）",
+                target_level=target_level,
+                text=text,
+            ),
+        }
+    ]
+
+
+def _finish_simplify(content, text, detected_hard_words):
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        data = {"original": text, "simplified": text, "english_translation": "", "changes": []}
+
+    # 欄位用哨兵接起來一次 convert：FFI 跨界一次，不是每欄一次。
+    # 這裡接的是整句 LLM 輸出，全形空白可能真的出現在句子裡，
+    # 會讓 split 切錯位；改用 NUL——不會出現在資料、OpenCC 原樣放行
+    sep = "\x00"
+    fields = [data.get("original", text), data.get("simplified", text), *detected_hard_words]
+    converted = _CC.convert(sep.join(fields)).split(sep)
+    data["original"] = converted[0]
+    data["simplified"] = converted[1]
+    data["hard_words"] = converted[2:]
+    return data
+
+
+def _quick_translate(text):
+    try:
+        response = ollama.chat(
+            model=QUICK_LLM_MODEL,
+            messages=[
+                {"role": "user", "content": QUICK_TRANSLATE_PROMPT.format(text=text)}
+            ],
+            options={"num_predict": 100},
+        )
+        return response["message"]["content"].strip()
+    except Exception:
+        return ""
+
+
+def _trivial_simplify(text):
+    """句子本來就在目標等級內：原句即簡化句，免跑 7B 模型"""
+    return {
+        "original": text,
+        "simplified": text,
+        "english_translation": _quick_translate(text),
+        "changes": [],
+        "hard_words": [],
+    }
+
+
+def _simplify_uncached(text, target_level=2):
+    detected_hard_words = _detect_hard_words(text, target_level)
+    if not detected_hard_words:
+        return _trivial_simplify(text)
+    response = ollama.chat(
+        model=LLM_MODEL,
+        messages=_simplify_messages(text, target_level, detected_hard_words),
+        format=_SIMPLIFY_SCHEMA,
+        options={"num_predict": 300},
+    )
+    return _finish_simplify(response["message"]["content"], text, detected_hard_words)
+
+
+async def simplify_text_async(text, target_level=2, client=None):
+    """simplify_text 的非同步版：LLM 呼叫 await，不佔住 thread。
+
+    jieba 前置偵測丟到 default executor，跟其他在途的 LLM 呼叫重疊。
+    """
+    cached = _cache_get(f"simplify:{target_level}:{text}")
+    if cached is not None:
+        return json.loads(cached)
+
+    loop = asyncio.get_running_loop()
+    detected_hard_words = await loop.run_in_executor(
+        None, _detect_hard_words, text, target_level
+    )
+    if not detected_hard_words:
+        data = await loop.run_in_executor(None, _trivial_simplify, text)
+        _cache_put(
+            f"simplify:{target_level}:{text}", json.dumps(data, ensure_ascii=False)
+        )
+        return data
+    if client is None:
+        client = ollama.AsyncClient()
+    response = await client.chat(
+        model=LLM_MODEL,
+        messages=_simplify_messages(text, target_level, detected_hard_words),
+        format=_SIMPLIFY_SCHEMA,
+        options={"num_predict": 300},
+    )
+    data = _finish_simplify(response["message"]["content"], text, detected_hard_words)
+    _cache_put(
+        f"simplify:{target_level}:{text}", json.dumps(data, ensure_ascii=False)
+    )
+    return data
+
+
+def simplify_batch(texts, target_level=2, max_concurrency=4):
+    """同時簡化多個句子，semaphore 限制同時在途的 LLM 呼叫數"""
+
+    async def _run():
+        client = ollama.AsyncClient()
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def _one(text):
+            async with sem:
+                return await simplify_text_async(text, target_level, client=client)
+
+        return await asyncio.gather(*[_one(t) for t in texts])
+
+    return asyncio.run(_run())
@@ -0,0 +1,40 @@
+async function streamNdjson(url, body, onChunk) {
+  const resp = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    const lines = buf.split("\n");
+    buf = lines.pop();
+    for (const line of lines) {
+      if (line.trim()) onChunk(JSON.parse(line));
+    }
+  }
+}
+
+function startProcess() {
+  const url = document.getElementById("url").value.trim();
+  if (!url) return;
+  const out = document.getElementById("transcript");
+  out.textContent = "⏳ 處理中...\n";
+  streamNdjson("/process", { url, task: "transcribe" }, (chunk) => {
+    if (chunk.transcript) out.textContent = chunk.transcript;
+  });
+}
+
+function analyze() {
+  const text = document.getElementById("sentence").value.trim();
+  if (!text) return;
+  const out = document.getElementById("analysis-result");
+  out.textContent = "";
+  streamNdjson("/analyze", { text }, (chunk) => {
+    if (chunk.analysis) out.textContent += chunk.analysis + "\n\n";
+  });
+}
@@ -0,0 +1,9 @@
+"""gunicorn 進入點：gunicorn -w 4 -k gthread --threads 8 wsgi:app
+
+不要加 --preload：預熱 thread 與連線池要在各 worker 自己的 process 裡起，
+理由見 run.sh。
+"""
+
+from services.app import create_app
+
+app = create_app()